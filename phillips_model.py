@@ -10,10 +10,26 @@
 # Total fields are denoted with suffix t and zonal means with suffix z
 
 import numpy as np
-from scipy.linalg.lapack import dgtsv, dgetrf, dgetrs
+from scipy.linalg.lapack import dgttrf, dgttrs, dgbtrf, dgbtrs
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import numba as nb
+import matplotlib.colors as colors
+import matplotlib.ticker as ticker
+try:
+    import numba as nb
+    have_numba = True
+except ImportError:
+    # Run the kernels as plain Python, with xcalc_np in place of
+    # xcalc_nb
+    have_numba = False
+    class nb:
+        @staticmethod
+        def njit(*args, **kwargs):
+            if args and callable(args[0]):
+                return args[0]
+            return lambda f: f
+        jit = njit
+        prange = range
 import time
 import netCDF4
 
@@ -21,6 +37,17 @@ def msq_rand(x):
     # Middle 10 digits following Hammer
     return ((x*x) // 10**5) % 10**10
 
+@nb.njit(cache=True)
+def _fill_msq(vals, r):
+    # Fill vals with the msq_rand sequence following r.
+    # x*x overflows int64 so split x = a*10**5 + b, then
+    # (x*x // 10**5) % 10**10 = (a*a % 10**5)*10**5 + 2*a*b + b*b // 10**5
+    for n in range(vals.size):
+        a = r // 10**5
+        b = r % 10**5
+        r = ( (a*a % 10**5)*10**5 + 2*a*b + b*b // 10**5 ) % 10**10
+        vals[n] = r
+
 class Grid:
     L = 6.0e6
     W = 5.0e6  # y coord goes from -W to W (Phillips notation])
@@ -29,58 +56,164 @@ class Grid:
     dx = L / nx   # 3.75e5
     dy = 2*W / ny # 6.25e5    # Gridsize
 
+@nb.njit(cache=True)
+def _pad_periodic(a, nx):
+    # Fill the periodic ghost columns, 0 is a copy of nx and nx+1 of 1
+    a[...,0] = a[...,nx]
+    a[...,nx+1] = a[...,1]
+
+@nb.njit(cache=True)
+def _set_end_rows(a, nx, ny):
+    # Boundary condition A17, the end rows of both levels are set to
+    # the zonal mean of their neighbours. Both means of a level come
+    # from one pass along i
+    for l in range(2):
+        sum0 = 0.0
+        sumn = 0.0
+        for i in range(1,nx+1):
+            sum0 += a[l,1,i]
+            sumn += a[l,ny-1,i]
+        a[l,0,:] = sum0/nx
+        a[l,ny,:] = sumn/nx
+
+@nb.njit(cache=True, fastmath=True)
+def _ssd(a, b, tol=np.inf):
+    # Sum of squared differences of two 2D arrays in one pass, without
+    # a temporary for the difference. Returns early with a partial sum
+    # once it exceeds tol, for convergence tests that only need to
+    # know the sum is too large.
+    ssum = 0.0
+    for j in range(a.shape[0]):
+        for i in range(a.shape[1]):
+            d = a[j,i] - b[j,i]
+            ssum += d*d
+        if ssum > tol:
+            return ssum
+    return ssum
+
+@nb.njit(cache=True)
+def _thomas_factor(a, b, c):
+    # Forward elimination of the tridiagonal matrices with sub-diagonal
+    # a, diagonal b[m] and super-diagonal c. This only depends on the
+    # matrices, so is kept for repeated solves with _thomas. Returns the
+    # modified super-diagonals and the inverse pivots. There is no
+    # pivoting, so the matrices must be diagonally dominant.
+    nm, n = b.shape
+    cp = np.zeros((nm,n))
+    rpiv = np.empty((nm,n))
+    for m in range(nm):
+        rpiv[m,0] = 1.0/b[m,0]
+        cp[m,0] = c[0]*rpiv[m,0]
+        for i in range(1,n):
+            rpiv[m,i] = 1.0/(b[m,i] - a[i-1]*cp[m,i-1])
+            if i < n-1:
+                cp[m,i] = c[i]*rpiv[m,i]
+    return cp, rpiv
+
+@nb.njit(cache=True)
+def _thomas(a, cp, rpiv, d, out):
+    # Solve for right hand side d[m] using the factors from
+    # _thomas_factor, result in out[m]. The systems share a and are
+    # substituted together.
+    nm, n = d.shape
+    for m in range(nm):
+        out[m,0] = d[m,0]*rpiv[m,0]
+    for i in range(1,n):
+        for m in range(nm):
+            out[m,i] = (d[m,i] - a[i-1]*out[m,i-1])*rpiv[m,i]
+    for i in range(n-2,-1,-1):
+        for m in range(nm):
+            out[m,i] -= cp[m,i]*out[m,i+1]
+
+# Largest system solved with _thomas, bigger ones go to LAPACK which
+# pivots and where the call overhead no longer matters
+thomas_max = 64
+
+def tridiag_factor(a, b, c):
+    # Factorise the systems of _thomas_factor for tridiag_solve
+    if b.shape[1] <= thomas_max:
+        return (a,) + _thomas_factor(a, b, c)
+    else:
+        return [dgttrf(a, b[m], c)[:5] for m in range(b.shape[0])]
+
+def tridiag_solve(factors, d, out):
+    # Solve for right hand side d[m], result in out[m]
+    if d.shape[1] <= thomas_max:
+        _thomas(*factors, d, out)
+    else:
+        for m, lu in enumerate(factors):
+            out[m] = dgttrs(*lu, d[m])[0]
+
 class Var():
 
     # Level 1 and 3 components of 3D variable
-
-    def __init__(self):
+    # Both levels are held in one array with level as the first
+    # dimension, and l1t etc. are views of the level slices.
+    # Arrays are indexed [j,i] so that i, the inner loop in all the
+    # stencils, is the contiguous dimension.
+    # Points are i=1..nx, columns 0 and nx+1 are periodic ghost columns
+    # that are only valid after _pad_periodic
+
+    def __init__(self, t=None, a=None, z=None):
         # Total field
-        self.l1t = np.zeros( (Grid.nx+1,Grid.ny+1) )
-        self.l3t = np.zeros( (Grid.nx+1,Grid.ny+1) )
+        self.t = np.zeros( (2,Grid.ny+1,Grid.nx+2) ) if t is None else t
+        self.l1t = self.t[0]
+        self.l3t = self.t[1]
         # Anomaly (zonal mean removed)
-        self.l1  = np.zeros( (Grid.nx+1,Grid.ny+1) )
-        self.l3  = np.zeros( (Grid.nx+1,Grid.ny+1) )
+        self.a = np.zeros( (2,Grid.ny+1,Grid.nx+2) ) if a is None else a
+        self.l1  = self.a[0]
+        self.l3  = self.a[1]
         # Zonal means
-        self.l1z  = np.zeros( Grid.ny+1 )
-        self.l3z  = np.zeros( Grid.ny+1 )
+        self.z = np.zeros( (2,Grid.ny+1) ) if z is None else z
+        self.l1z  = self.z[0]
+        self.l3z  = self.z[1]
+
+    @classmethod
+    def from_view(cls, t, a, z):
+        # Var using existing arrays, e.g. slices of a larger block
+        return cls(t, a, z)
 
     def dump(self):
         for j in range(0,Grid.ny+1):
             for i in range(1,Grid.nx+1):
-                print(f"{self.l1t[i,j]:12.4f}", end="")
+                print(f"{self.l1t[j,i]:12.4f}", end="")
             print()
 
     def adump(self):
         for j in range(0,Grid.ny+1):
             for i in range(1,Grid.nx+1):
-                print(f"{self.l1[i,j]:12.4f}", end="")
+                print(f"{self.l1[j,i]:12.4f}", end="")
             print()
 
     def settot(self,val):
         if isinstance(val,Var):
-            self.l1t[:] = val.l1t
-            self.l3t[:] = val.l3t
+            self.t[:] = val.t
         else:
-            self.l1t[:] = val
-            self.l3t[:] = val
+            self.t[:] = val
 
     def set(self,val):
         if isinstance(val,Var):
-            self.l1[:] = val.l1
-            self.l3[:] = val.l3
+            self.a[:] = val.a
         else:
-            self.l1[:] = val
-            self.l3[:] = val
+            self.a[:] = val
 
+    # These write directly into the existing arrays to avoid temporaries
     def calc_zmean(self):
-        self.l1z[:] = self.l1t[1:Grid.nx+1,:].mean(axis=0)
-        self.l3z[:] = self.l3t[1:Grid.nx+1,:].mean(axis=0)
+        np.mean(self.t[:,:,1:Grid.nx+1], axis=2, out=self.z)
 
     def split(self):
         self.calc_zmean()
-        self.l1[:] = self.l1t[:] - self.l1z[:]
-        self.l3[:] = self.l3t[:] - self.l3z[:]
+        np.subtract(self.t, self.z[:,:,np.newaxis], out=self.a)
+
+    def combine(self):
+        # Inverse of split, total field from the anomaly and zonal mean
+        np.add(self.a, self.z[:,:,np.newaxis], out=self.t)
+
 
+class ModelBreakdown(Exception):
+    # The model has become unstable (Phillips' nonlinear instability),
+    # so the run should stop
+    pass
 
 class Model:
 
@@ -100,7 +233,9 @@ class Model:
     # Control variables
     a = 1.0e5               # m^2/s   Horizonal diffusion
     diag_flag = False
-    accel = 1.0
+    # SOR over-relaxation factor for relax1. Optimal value for a Jacobi
+    # spectral radius of cos(pi/nx)
+    omega = 2.0/(1.0 + np.sqrt(1.0 - np.cos(np.pi/Grid.nx)**2))
 
     noisescale = 7.509e6
 
@@ -117,13 +252,7 @@ class Model:
     diag_freq = 3600
 
     first_step = True # For solver initialisation
-
-    # All initialised to zero, so model is at rest
-    v =  Var() #  ! Vorticity
-    vm = Var() #  ! Vorticity at tau - 1 values
-    s  = Var() #  ! Streamfunction
-    # Temporaries used in timestepping
-    x = Var()
+    zvor_dt = None    # Time step of the cached calc_zvor factorisation
 
     time = 0
     day = 0
@@ -139,30 +268,33 @@ class Model:
     # u_levels = np.linspace(-25,25,11)   # 750 hPa
     u_cmap = 'RdBu_r'
 
+    def __init__(self):
+        # Model state, each of v, vm, s and x is a view into one
+        # contiguous block for each of the total, anomaly and zonal
+        # mean fields. All initialised to zero, so model is at rest
+        self.state = np.zeros( (4,2,Grid.ny+1,Grid.nx+2) )
+        self.anom = np.zeros( (4,2,Grid.ny+1,Grid.nx+2) )
+        self.zonal = np.zeros( (4,2,Grid.ny+1) )
+        self.v, self.vm, self.s, self.x = [
+            Var.from_view(self.state[n], self.anom[n], self.zonal[n])
+            for n in range(4) ]
+        # v   Vorticity
+        # vm  Vorticity at tau - 1 values
+        # s   Streamfunction
+        # x   Temporary used in timestepping
+
+        # Scratch variables reused at every call rather than reallocated
+        self.scratch_u = Var()      # calc_u in diag and nc_output
+        self.scratch_v = Var()      # calc_v in diag and nc_output
+        self.scratch_relax2 = Var() # Previous iterate in relax2
+        # Red-black masks of the interior points for relax2
+        jj, ii = np.mgrid[1:Grid.ny,1:Grid.nx+1]
+        self.relax2_masks = [ (ii+jj)%2 == color for color in range(2) ]
+        self.scratch_ssurf = np.zeros( (Grid.ny+1,Grid.nx+2) ) # calc_usurf
 
     def calcvor(self, s, v):
-        # This repeats same code for each level. Should the level be another dimension?
-        for j in range(1,Grid.ny):
-            jm = j-1
-            jp = j+1
-            for i in range(1,Grid.nx+1):
-                im = i-1
-                if im == 0:
-                    im = Grid.nx
-                ip = i+1
-                if ip == Grid.nx+1:
-                    ip = 1
-                v.l1t[i,j] = ( s.l1t[ip,j]  + s.l1t[im,j] - 2*s.l1t[i,j] ) + \
-                    self.epsq * ( s.l1t[i,jp] + s.l1t[i,jm] - 2*s.l1t[i,j] ) - \
-                    self.gamma * ( s.l1t[i,j] - s.l3t[i,j] )
-                v.l3t[i,j] = ( s.l3t[ip,j] + s.l3t[im,j] - 2*s.l3t[i,j] ) + \
-                    self.epsq * ( s.l3t[i,jp] + s.l3t[i,jm] - 2*s.l3t[i,j] ) + \
-                    self.gamma * ( s.l1t[i,j] - s.l3t[i,j] )
-        # Follow A17 and set end rows to zonal mean of neighbours
-        v.l1t[:,0] = v.l1t[:,1].mean()
-        v.l1t[:,Grid.ny] = v.l1t[:,Grid.ny-1].mean()
-        v.l3t[:,0] = v.l3t[:,1].mean()
-        v.l3t[:,Grid.ny] = v.l3t[:,Grid.ny-1].mean()
+        _pad_periodic(s.t, Grid.nx)
+        calcvor_nb(s.t, v.t, self.epsq, self.gamma)
 
     def calc_zonstream(self, v, s):
         # Given vorticity variable as input, solve for the
@@ -170,6 +302,9 @@ class Model:
 
         ny = Grid.ny
         nz = 2*ny - 3  #  Number of zonal means to solve for
+        # The level coupling terms are ny-2 off the diagonal so the
+        # matrix is banded
+        kl = ku = ny-2
         epsq = self.epsq
         gamma = self.gamma
 
@@ -208,20 +343,23 @@ class Model:
                 amat[j,j] = -2.0*epsq - gamma
                 amat[j,j+1] = epsq
 
-            self.lu, self.piv, info = dgetrf(amat[1:,1:])
+            # LAPACK band storage, ab[kl+ku+i-j,j] = a[i,j], with kl extra
+            # rows for the fill in from pivoting
+            ab = np.zeros((2*kl+ku+1,nz))
+            for j in range(nz):
+                for i in range(max(0,j-ku), min(nz,j+kl+1)):
+                    ab[kl+ku+i-j,j] = amat[i+1,j+1]
+            self.lu, self.piv, info = dgbtrf(ab, kl, ku)
 
         bmat = np.zeros(nz+1)
         bmat[1:ny] = v.l1z[1:ny]
-        for j in range(2,ny):
-            bmat[ny-2+j] = v.l3z[j]
+        bmat[ny:nz+1] = v.l3z[2:ny]
 
         # Solve AX=B
-        bmat[1:], info = dgetrs(self.lu, self.piv, bmat[1:])
+        bmat[1:], info = dgbtrs(self.lu, kl, ku, bmat[1:], self.piv)
 
-        for j in range(1,ny):
-            s.l1z[j] = bmat[j]
-        for j in range(2,ny):
-            s.l3z[j] = bmat[ny-2+j]
+        s.l1z[1:ny] = bmat[1:ny]
+        s.l3z[2:ny] = bmat[ny:nz+1]
 
         # Apply the BC
         s.l1z[0] = s.l1z[1]
@@ -237,41 +375,44 @@ class Model:
         # print("V1 anom", abs(v.l1).max())
         nx = Grid.nx
         ny = Grid.ny
+        diag = 2.0 + 2.0*self.epsq + self.gamma
+        inv = self.omega / diag
         # Start from the current value of the anomaly streamfunction
         for iter in range(100):
-            # Jacobi iteration
+            # Red-black Gauss-Seidel iteration with over-relaxation
             maxdiff = 0.0
             change = 0.0
-            # for irb in range(2):
-            for j in range(1,ny):
-                jm = j-1
-                jp = j+1
-                for i in range(1,nx+1):
-                    im = i-1
-                    if im == 0:
-                        im = nx
-                    ip = i+1
-                    if ip == nx+1:
-                        ip = 1
-
-                    resid = ( s.l1[ip,j] + s.l1[im,j] +
-                                self.epsq*( s.l1[i,jp] + s.l1[i,jm] ) -
-                                v.l1[i,j] + self.gamma*s.l3[i,j] ) -  \
-                                ( 2.0 + 2.0*self.epsq + self.gamma )*s.l1[i,j]
-                    resid = self.accel*resid / ( 2.0 + 2.0*self.epsq + self.gamma )
-                    change = change + resid**2
-                    maxdiff = max ( maxdiff, abs(resid) )
-                    s.l1[i,j] = s.l1[i,j] + resid
-
-                    resid = ( s.l3[ip,j] + s.l3[im,j] +
-                                self.epsq*( s.l3[i,jp] + s.l3[i,jm] ) -
-                                v.l3[i,j] + self.gamma*s.l1[i,j] ) -  \
-                                ( 2.0 + 2.0*self.epsq + self.gamma )*s.l3[i,j]
-
-                    resid = self.accel*resid / ( 2.0 + 2.0*self.epsq + self.gamma )
-                    change = change + resid**2
-                    maxdiff = max ( maxdiff, abs(resid) )
-                    s.l3[i,j] = s.l3[i,j] + resid
+            for color in range(2):
+                for j in range(1,ny):
+                    jm = j-1
+                    jp = j+1
+                    # First point of this colour, (i+j)%2 == color
+                    for i in range(1+(j+1+color)%2,nx+1,2):
+                        im = i-1
+                        if im == 0:
+                            im = nx
+                        ip = i+1
+                        if ip == nx+1:
+                            ip = 1
+
+                        resid = ( s.l1[j,ip] + s.l1[j,im] +
+                                    self.epsq*( s.l1[jp,i] + s.l1[jm,i] ) -
+                                    v.l1[j,i] + self.gamma*s.l3[j,i] ) -  \
+                                    diag*s.l1[j,i]
+                        resid = inv*resid
+                        change = change + resid**2
+                        maxdiff = max ( maxdiff, abs(resid) )
+                        s.l1[j,i] = s.l1[j,i] + resid
+
+                        resid = ( s.l3[j,ip] + s.l3[j,im] +
+                                    self.epsq*( s.l3[jp,i] + s.l3[jm,i] ) -
+                                    v.l3[j,i] + self.gamma*s.l1[j,i] ) -  \
+                                    diag*s.l3[j,i]
+
+                        resid = inv*resid
+                        change = change + resid**2
+                        maxdiff = max ( maxdiff, abs(resid) )
+                        s.l3[j,i] = s.l3[j,i] + resid
             # print("ITER1", iter, np.sqrt(change), maxdiff)
             # maxdiff is now only on a single level so halve the convergence
             # criterion
@@ -284,45 +425,41 @@ class Model:
     def relax2(self, x, dt, v):
         # Solve for anomaly vorticity
 
-        temp = Var()
         nx = Grid.nx
         ny = Grid.ny
 
-        v.l1[:] = 0.0
-        v.l3[:] = 0.0
+        # Red-black Gauss-Seidel as in relax2_nb. Points of one colour
+        # only depend on points of the other, so each half sweep is a
+        # single array update over both levels. old holds the values
+        # before the half sweep for the change sums.
+        va = v.a
+        vc = va[:,1:ny,1:nx+1]
+        old = self.scratch_relax2.a[:,1:ny,1:nx+1]
+
+        va[:] = 0.0
         alpha = self.a*dt/Grid.dx**2
+        inv1 = 1.0 / ( 2*alpha*(1.0 + self.epsq)  + 1.0 )
+        inv3 = 1.0 / ( 2*alpha*(1.0 + self.epsq)  + 1.0 +1.5*self.k*dt )
+        inv = np.array([inv1, inv3])[:,np.newaxis,np.newaxis]
         for iter in range(100):
-            # Jacobi iteration
-            for j in range(1,ny):
-                jm = j-1
-                jp = j+1
-                for i in range(1,nx+1):
-                    im = i-1
-                    if im == 0:
-                        im = nx
-                    ip = i+1
-                    if ip == nx+1:
-                        ip = 1
-                    temp.l1[i,j] = ( alpha*( v.l1[ip,j] + v.l1[im,j] +
-                                             self.epsq * ( v.l1[i,jp] + v.l1[i,jm] ) ) +
-                                     x.l1[i,j]  ) /    \
-                                     ( 2*alpha*(1.0 + self.epsq)  + 1.0 )
-                    temp.l3[i,j] = ( alpha*( v.l3[ip,j] + v.l3[im,j] +
-                                             self.epsq * ( v.l3[i,jp] + v.l3[i,jm] ) ) +
-                                     x.l3[i,j]  ) /    \
-                                     ( 2*alpha*(1.0 + self.epsq)  + 1.0 +1.5*self.k*dt )
-            change1 = np.sum ( ( v.l1[1:,1:] - temp.l1[1:,1:] ) **2 )
-            v.l1[:,1:ny] = temp.l1[:,1:ny]
+            change1 = 0.0
+            change3 = 0.0
+            for mask in self.relax2_masks:
+                _pad_periodic(va, nx)
+                np.copyto(old, vc)
+                new = ( alpha*( va[:,1:ny,2:nx+2] + va[:,1:ny,0:nx] +
+                                self.epsq * ( va[:,2:ny+1,1:nx+1] + va[:,0:ny-1,1:nx+1] ) ) +
+                        x.a[:,1:ny,1:nx+1] ) * inv
+                np.copyto(vc, new, where=mask)
+                # Only compared with 1.0 below, so the sums can stop there
+                change1 += _ssd(old[0], vc[0], 1.0)
+                change3 += _ssd(old[1], vc[1], 1.0)
             # Boundary condition A17
-            v.l1[:,0] = v.l1[:,1].mean()
-            v.l1[:,ny] = v.l1[:,ny-1].mean()
-            change3 = np.sum ( ( v.l3[1:,1:] - temp.l3[1:,1:] ) **2 )
-            v.l3[:,1:ny] = temp.l3[:,1:ny]
-            v.l3[:,0] = v.l3[:,1].mean()
-            v.l3[:,ny] = v.l3[:,ny-1].mean()
+            _set_end_rows(va, nx, ny)
             if max(change1, change3) < 1.0:
                 # print("ITER2", iter, np.sqrt(change1), np.sqrt(change3))
                 break
+        _pad_periodic(va, nx)
 
     def xcalc(self, v, vm, s, dt, x):
 
@@ -332,73 +469,74 @@ class Model:
         b = self.beta*Grid.dx**2*Grid.dy
         c = dt/(2.0*Grid.dx*Grid.dy)
         h = 4*self.rgas*self.heat*self.gamma*dt/(self.f0*self.cp)
+        # Halo fill once, so the periodic neighbours in x are just the
+        # ghost columns
+        _pad_periodic(v.t, nx)
+        _pad_periodic(vm.t, nx)
+        _pad_periodic(s.t, nx)
+        # Loop invariants
+        two_b = 2.0*b
+        inv_ny = 1.0/ny
+        kdt = self.k*dt
+        four_gamma = 4*self.gamma
         x.l1t[:] = 0.0
         x.l3t[:] = 0.0
         for j in range(1,ny):
             jm = j-1
             jp = j+1
+            # Heating only depends on j
+            forcing_j = h*(2*j-ny)*inv_ny
             for i in range(1,nx+1):
                 im = i-1
-                if im == 0:
-                    im = nx
                 ip = i+1
-                if ip == nx+1:
-                    ip = 1
-
-                x.l1t[i,j] = vm.l1t[i,j] +                                           \
-                    c * ( (v.l1t[ip,j]-v.l1t[im,j])*(s.l1t[i,jp]-s.l1t[i,jm]) -             \
-                          (2*b+v.l1t[i,jp]-v.l1t[i,jm])*(s.l1t[ip,j]-s.l1t[im,j]) ) +      \
-                          alpha * ( vm.l1t[ip,j]+vm.l1t[im,j]-2*vm.l1t[i,j] +           \
-                                    self.epsq*(vm.l1t[i,jp]+vm.l1t[i,jm]-2*vm.l1t[i,j]) ) +        \
-                        h*(2*j-ny)/ny
-
-                x.l3t[i,j] = vm.l3t[i,j] +                                             \
-                    c * ( (v.l3t[ip,j]-v.l3t[im,j])*(s.l3t[i,jp]-s.l3t[i,jm]) -              \
-                           (2*b+v.l3t[i,jp]-v.l3t[i,jm])*(s.l3t[ip,j]-s.l3t[im,j]) ) +       \
-                           alpha * ( vm.l3t[ip,j]+vm.l3t[im,j]-2*vm.l3t[i,j] +            \
-                                    self.epsq*(vm.l3t[i,jp]+vm.l3t[i,jm]-2*vm.l3t[i,j]) ) -  \
-                        h*(2*j-ny)/ny
-                x.l3t[i,j] = x.l3t[i,j] -  self.k*dt*(1.5*vm.l3t[i,j] - v.l1t[i,j] -
-                                    4*self.gamma*(s.l1t[i,j]-s.l3t[i,j]) )
+
+                x.l1t[j,i] = vm.l1t[j,i] +                                           \
+                    c * ( (v.l1t[j,ip]-v.l1t[j,im])*(s.l1t[jp,i]-s.l1t[jm,i]) -             \
+                          (two_b+v.l1t[jp,i]-v.l1t[jm,i])*(s.l1t[j,ip]-s.l1t[j,im]) ) +      \
+                          alpha * ( vm.l1t[j,ip]+vm.l1t[j,im]-2*vm.l1t[j,i] +           \
+                                    self.epsq*(vm.l1t[jp,i]+vm.l1t[jm,i]-2*vm.l1t[j,i]) ) +        \
+                        forcing_j
+
+                x.l3t[j,i] = vm.l3t[j,i] +                                             \
+                    c * ( (v.l3t[j,ip]-v.l3t[j,im])*(s.l3t[jp,i]-s.l3t[jm,i]) -              \
+                           (two_b+v.l3t[jp,i]-v.l3t[jm,i])*(s.l3t[j,ip]-s.l3t[j,im]) ) +       \
+                           alpha * ( vm.l3t[j,ip]+vm.l3t[j,im]-2*vm.l3t[j,i] +            \
+                                    self.epsq*(vm.l3t[jp,i]+vm.l3t[jm,i]-2*vm.l3t[j,i]) ) -  \
+                        forcing_j
+                x.l3t[j,i] = x.l3t[j,i] -  kdt*(1.5*vm.l3t[j,i] - v.l1t[j,i] -
+                                    four_gamma*(s.l1t[j,i]-s.l3t[j,i]) )
+
+    def zvor_setup(self, dt):
+        # Factorise the tridiagonal matrices for calc_zvor. They only
+        # depend on dt, so only factorise them again when the time step
+        # changes
+        nz = Grid.ny-1
+        epsq = self.epsq
+        if dt != self.zvor_dt:
+            self.zvor_dt = dt
+            alpha = self.a*dt/Grid.dx**2
+            # Off diagonals are the same for both levels
+            amat = np.full(nz-1, alpha*epsq)
+            cmat = np.full(nz-1, alpha*epsq)
+            # Diagonals, bmat[0] for level 1 and bmat[1] for level 3
+            bmat = np.zeros((2,nz))
+            bmat[:,0] = bmat[:,nz-1] = -alpha*epsq - 1
+            bmat[:,1:nz-1] = -2.0*alpha*epsq - 1
+            bmat[1] -= 1.5*self.k*dt
+            # The right hand side is -x, so factorise the negated
+            # matrices and solve with x directly
+            self.zvor_factors = tridiag_factor(-amat, -bmat, -cmat)
 
     def calc_zvor(self, x, dt, v):
         # Solve for the zonal mean vorticity
         ny = Grid.ny
-        epsq = self.epsq
-
         nz = ny-1
-        amat = np.zeros(nz-1)
-        bmat = np.zeros(nz)
-        cmat = np.zeros(nz-1)
-        rmat = np.zeros(nz)
+        self.zvor_setup(dt)
 
-        alpha = self.a*dt/Grid.dx**2
-        # Level 1
-        amat[:] = alpha*epsq
-        bmat[0] = bmat[nz-1] = -alpha*epsq - 1
-        bmat[1:nz-1] = -2.0*alpha*epsq - 1
-        cmat[:] = alpha*epsq
-        rmat[:] = -x.l1z[1:nz+1]
-
-        result = dgtsv(amat, bmat, cmat, rmat)
-        umat = result[3]
-        v.l1z[1:nz+1] = umat[:]
-        v.l1z[0] = v.l1z[1]
-        v.l1z[ny] = v.l1z[ny-1]
-
-        # Level 3
-        # amat[:] = alpha*epsq
-        # bmat[0] = bmat[nz-1] = -alpha*epsq - 1 - 1.5*self.k*dt
-        # bmat[1:nz-1] = -2.0*alpha*epsq - 1 - 1.5*self.k*dt
-        # cmat[:] = alpha*epsq
-        bmat -= 1.5*self.k*dt
-        rmat[:] = -x.l3z[1:nz+1]
-
-        result = dgtsv(amat, bmat, cmat, rmat)
-        umat = result[3]
-        v.l3z[1:nz+1] = umat[:]
-        v.l3z[0] = v.l3z[1]
-        v.l3z[ny] = v.l3z[ny-1]
+        # Both levels in one pass
+        tridiag_solve(self.zvor_factors, x.z[:,1:nz+1], v.z[:,1:nz+1])
+        v.z[:,0] = v.z[:,1]
+        v.z[:,ny] = v.z[:,ny-1]
 
     def zonal_diag(self, day, s):
         u = Var()
@@ -425,20 +563,35 @@ class Model:
     def calc_ps(self):
         return 0.01 * (1.5*self.s.l3t - 0.5*self.s.l1t)*self.f0
 
-    def calc_u(self, s):
-        u = Var()
-        u.l1t[:,1:] = - ( s.l1t[:,1:Grid.ny+1] - s.l1t[:,0:Grid.ny] ) / Grid.dy
-        u.l3t[:,1:] = - ( s.l3t[:,1:Grid.ny+1] - s.l3t[:,0:Grid.ny] ) / Grid.dy
+    def calc_u(self, s, out=None):
+        # Results are written to out if given, otherwise to a new Var
+        u = Var() if out is None else out
+        u.l1t[1:,:] = - ( s.l1t[1:Grid.ny+1,:] - s.l1t[0:Grid.ny,:] ) / Grid.dy
+        u.l3t[1:,:] = - ( s.l3t[1:Grid.ny+1,:] - s.l3t[0:Grid.ny,:] ) / Grid.dy
         return u
 
-    def calc_v(self, s):
-        v = Var()
+    def calc_usurf(self, s, out=None):
+        # Surface zonal wind, 1.5*u3 - 0.5*u1, from the same extrapolation
+        # of the streamfunction so only one difference is needed. Written
+        # to out if given, otherwise to a new array. As for calc_u row 0
+        # is not used.
+        usurf = np.zeros( (Grid.ny+1,Grid.nx+2) ) if out is None else out
+        ssurf = self.scratch_ssurf
+        np.multiply(s.l1t, 0.5, out=usurf)
+        np.multiply(s.l3t, 1.5, out=ssurf)
+        ssurf -= usurf
+        np.subtract(ssurf[0:Grid.ny], ssurf[1:Grid.ny+1], out=usurf[1:])
+        usurf[1:] /= Grid.dy
+        usurf[0] = 0.0
+        return usurf
+
+    def calc_v(self, s, out=None):
+        v = Var() if out is None else out
+        _pad_periodic(s.t, Grid.nx)
         for i in range(1,Grid.nx+1):
             im = i-1
-            if im == 0:
-                im = Grid.nx
-            v.l1t[i,:] = ( s.l1t[i,:] - s.l1t[im,:] ) / Grid.dx
-            v.l3t[i,:] = ( s.l3t[i,:] - s.l3t[im,:] ) / Grid.dx
+            v.l1t[:,i] = ( s.l1t[:,i] - s.l1t[:,im] ) / Grid.dx
+            v.l3t[:,i] = ( s.l3t[:,i] - s.l3t[:,im] ) / Grid.dx
         return v
 
     def calc_energy(self, s, u, v):
@@ -448,10 +601,11 @@ class Model:
         nx = Grid.nx; ny = Grid.ny
 
         zke = 10.0*np.sum(u.l1z*u.l1z + u.l3z*u.l3z)/(2*ny)
-        eke = 10.0*np.sum(u.l1**2 + u.l3**2 + v.l1**2 + v.l3**2)/(2*ny*nx)
+        eke = 10.0*np.sum(u.l1[:,1:nx+1]**2 + u.l3[:,1:nx+1]**2 +
+                          v.l1[:,1:nx+1]**2 + v.l3[:,1:nx+1]**2)/(2*ny*nx)
 
         zpe = 5*self.lambdasq*np.sum((s.l1z[1:ny] - s.l3z[1:ny])**2) / ny
-        epe = 5*self.lambdasq*np.sum((s.l1[:,1:ny] - s.l3[:,1:ny])**2) / (nx*ny)
+        epe = 5*self.lambdasq*np.sum((s.l1[1:ny,1:nx+1] - s.l3[1:ny,1:nx+1])**2) / (nx*ny)
 
         return zke, eke, zpe, epe
 
@@ -460,48 +614,41 @@ class Model:
         nx = Grid.nx; ny = Grid.ny
         dx = Grid.dx; dy = Grid.dy
 
-        u = self.calc_u(s)
-        v = self.calc_v(s)
+        u = self.calc_u(s, self.scratch_u)
+        v = self.calc_v(s, self.scratch_v)
         zke, eke, zpe, epe = self.calc_energy(s, u, v)
 
         # Is this KE with the shifted winds useful?
         # Which is best in the energy conversions?
         # vshift = Var()
-        # #  Average v to get it on the same grid points as u
-        # for i in range(1,nx+1):
-        #     ip = i+1
-        #     if ip > nx:
-        #         ip = 1
-        #     for j in range(1,ny+1):
-        #         vshift.l1t[i][j] = 0.25*(v.l1t[i][j] + v.l1t[ip][j] +
-        #                             v.l1t[i][j-1] + v.l1t[ip][j-1])
-        #         vshift.l3t[i][j] = 0.25*(v.l3t[i][j] + v.l3t[ip][j] +
-        #                             v.l3t[i][j-1] + v.l3t[ip][j-1])
+        # #  Average v to get it on the same grid points as u, the ghost
+        # #  column nx+1 gives the periodic neighbour
+        # _pad_periodic(v.t, nx)
+        # vshift.t[:,1:,1:nx+1] = 0.25*(v.t[:,1:,1:nx+1] + v.t[:,1:,2:nx+2] +
+        #                               v.t[:,:-1,1:nx+1] + v.t[:,:-1,2:nx+2])
         # # print("MAX V", v.l1t.max(), vshift.l1t.max())
         # vshift.split()
         # # Note factor of 10 here.
-        # tke = 10.0*np.sum(u.l1t[1:,1:]*u.l1t[1:,1:] + u.l3t[1:,1:]*u.l3t[1:,1:] +
-        #                     vshift.l1t[1:,1:]*vshift.l1t[1:,1:] + vshift.l3t[1:,1:]*vshift.l3t[1:,1:])/(2*ny*nx)
+        # tke = 10.0*np.sum(u.t[:,1:,1:nx+1]**2 +
+        #                     vshift.t[:,1:,1:nx+1]**2)/(2*ny*nx)
 
         print("KE %6.2f %9.2f %9.2f %9.2f %9.2f" %( day, zke, eke, epe, zpe))
         if eke > 1e5:
-            raise Exception("EKE too large")
+            raise ModelBreakdown(f"EKE too large at day {day:.2f}")
+
+        # For reuse by nc_output
+        return u, v, (zke, eke, zpe, epe)
 
     def stability_criterion(self, dt, s):
         # Stability criterion (A13)
-        smax = 0.
-        for i in range(1,Grid.nx+1):
-            im = i-1
-            if im == 0:
-                im = Grid.nx
-            ip = i+1
-            if ip > Grid.nx:
-                ip = 1
-            for j in range(1,Grid.ny):
-                jm = j-1
-                jp = j+1
-                smax = max(smax, abs(s.l1t[ip,j]-s.l1t[im,j]) + abs(s.l1t[i,jp]-s.l1t[i,jm]))
-                smax = max(smax, abs(s.l3t[ip,j]-s.l3t[im,j]) + abs(s.l3t[i,jp]-s.l3t[i,jm]))
+        nx = Grid.nx
+        ny = Grid.ny
+        _pad_periodic(s.t, nx)
+        # Both levels at once, the ghost columns give the periodic
+        # neighbours in x
+        dsx = np.abs(s.t[:,1:ny,2:nx+2] - s.t[:,1:ny,0:nx])
+        dsy = np.abs(s.t[:,2:ny+1,1:nx+1] - s.t[:,0:ny-1,1:nx+1])
+        smax = (dsx + dsy).max()
         return 0.5*dt*smax / (Grid.dx*Grid.dy)
 
     def create_nc_output(self):
@@ -568,31 +715,43 @@ class Model:
         ds.variables['lev'][:] = [1., 3.]
 
         self.irec = -1
+        # float32 buffers for both levels, so each write is a single
+        # downcast copy of the interior points
+        self.nc_buf = np.empty((2, Grid.ny+1, Grid.nx), dtype=np.float32)
+        self.nc_ubuf = np.empty((2, Grid.ny, Grid.nx), dtype=np.float32)
+
+    def nc_output(self, day, v, s, diags=None):
+        # diags is the result of diag for this s if it has already
+        # been called, otherwise the winds and energies are calculated
+        if diags is None:
+            u = self.calc_u(s, self.scratch_u)
+            vtmp = self.calc_v(s, self.scratch_v)
+            energies = self.calc_energy(s, u, vtmp)
+        else:
+            u, vtmp, energies = diags
 
-    def nc_output(self, day, v, s):
-        # Python variables are (nx, ny) so need to transpose when writing
-        # to match netCDF dimensions
         self.irec += 1
-        self.ds.variables['vor'][self.irec,0] = v.l1t[1:].T
-        self.ds.variables['vor'][self.irec,1] = v.l3t[1:].T
-        self.ds.variables['strm'][self.irec,0] = s.l1t[1:].T
-        self.ds.variables['strm'][self.irec,1] = s.l3t[1:].T
-
-        u = self.calc_u(s)
-        self.ds.variables['u'][self.irec,0] = u.l1t[1:,1:].T
-        self.ds.variables['u'][self.irec,1] = u.l3t[1:,1:].T
-        vtmp = self.calc_v(s)
-        self.ds.variables['v'][self.irec,0] = vtmp.l1t[1:].T
-        self.ds.variables['v'][self.irec,1] = vtmp.l3t[1:].T
-
-        zke, eke, zpe, epe = self.calc_energy(s, u, vtmp)
+        buf = self.nc_buf
+        np.copyto(buf, v.t[:,:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['vor'][self.irec] = buf
+        np.copyto(buf, s.t[:,:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['strm'][self.irec] = buf
+
+        np.copyto(self.nc_ubuf, u.t[:,1:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['u'][self.irec] = self.nc_ubuf
+        np.copyto(buf, vtmp.t[:,:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['v'][self.irec] = buf
+
+        zke, eke, zpe, epe = energies
         self.ds.variables['zke'][self.irec] = zke
         self.ds.variables['eke'][self.irec] = eke
         self.ds.variables['zpe'][self.irec] = zpe
         self.ds.variables['epe'][self.irec] = epe
 
-        self.ds.variables['t500'][self.irec] = self.calc_T()[1:].T
-        self.ds.variables['ps'][self.irec] = self.calc_ps()[1:].T
+        np.copyto(buf[0], self.calc_T()[:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['t500'][self.irec] = buf[0]
+        np.copyto(buf[0], self.calc_ps()[:,1:Grid.nx+1], casting='unsafe')
+        self.ds.variables['ps'][self.irec] = buf[0]
 
         # Use time since perturbation
         self.ds.variables['time'][self.irec] = day - self.day1
@@ -612,21 +771,17 @@ class Model:
             s.l1[:] = 0.0
             s.l3[:] = 0.0
 
-            # Should be a function
-            for j in range(Grid.ny+1):
-                s.l1t[:,j] = s.l1[:,j] + s.l1z[j]
-                s.l3t[:,j] = s.l3[:,j] + s.l3z[j]
+            s.combine()
             if self.time % self.diag_freq == 0:
                 self.zonal_diag(self.day, s)
 
             # Time stepping
             # self.xcalc(v, vm, s, self.dt, x)
-            alpha = self.a*self.dt/Grid.dx**2
-            b = self.beta*Grid.dx**2*Grid.dy
-            c = self.dt/(2.0*Grid.dx*Grid.dy)
-            h = 4*self.rgas*self.heat*self.gamma*self.dt/(self.f0*self.cp)
-            xcalc_nb(v.l1t, v.l3t, vm.l1t, vm.l3t, s.l1t, s.l3t, x.l1t, x.l3t,
-                     self.dt, Grid.nx, Grid.ny, self.epsq, alpha, b, c, h, self.k, self.gamma)
+            alpha, b, c, h = xcalc_coeffs_nb(self.dt, self.a, self.beta,
+                                             self.rgas, self.heat, self.gamma,
+                                             self.f0, self.cp)
+            xcalc_nb(v.t, vm.t, s.t, x.t, self.dt, self.epsq,
+                     alpha, b, c, h, self.k, self.gamma)
 
             x.split()
 
@@ -636,16 +791,13 @@ class Model:
             if self.time == 0.0:
                 # Forward step from rest. This simple form for the forward step
                 # assumes that it's starting from rest.
-                v.l1z = 0.5*x.l1z
-                v.l3z = 0.5*x.l3z
+                v.z[:] = 0.5*x.z
             else:
                 # Update previous value of vorticity
                 vm.settot(v)
 
             v.set(0.0)
-            for j in range(Grid.ny+1):
-                v.l1t[:,j] = v.l1z[j]
-                v.l3t[:,j] = v.l3z[j]
+            v.combine()
 
             self.time += self.dt
             self.day = self.time/86400.0
@@ -663,25 +815,22 @@ class Model:
 
         # Time step has changed so linearly interpolate the previous time
         # value to ensure a smooth start
-        vm.l1t[:] = v.l1t - (v.l1t-vm.l1t)*self.dt2/self.dt1
-        vm.l3t[:] = v.l3t - (v.l3t-vm.l3t)*self.dt2/self.dt1
+        vm.t[:] = v.t - (v.t-vm.t)*self.dt2/self.dt1
 
-        rval = 1_111_111_111
-        for i in range(1,Grid.nx+1):
-            for j in range(1,Grid.ny):
-                rval = msq_rand(rval)
-                stmp.l1t[i,j] = float(rval) / 10**10
-                stmp.l3t[i,j] = stmp.l1t[i,j]
+        nx = Grid.nx
+        ny = Grid.ny
+        vals = np.empty(nx*(ny-1), dtype=np.int64)
+        _fill_msq(vals, 1_111_111_111)
+        # Sequence runs along j first
+        stmp.l1t[1:ny,1:nx+1] = vals.reshape(nx,ny-1).T / 10**10
+        stmp.l3t[:] = stmp.l1t
         # Remove the zonal mean and scale
         stmp.split()
-        stmp.l1t[:] = self.noisescale*stmp.l1[:]
-        stmp.l3t[:] = self.noisescale*stmp.l3[:]
+        stmp.t[:] = self.noisescale*stmp.a
         # Convert this to a vorticity anomaly
         self.calcvor(stmp, vtmp)
-        v.l1t[:] += vtmp.l1t
-        v.l3t[:] += vtmp.l3t
-        vm.l1t[:] += vtmp.l1t
-        vm.l3t[:] += vtmp.l3t
+        v.t[:] += vtmp.t
+        vm.t[:] += vtmp.t
 
     def step(self):
 
@@ -694,49 +843,35 @@ class Model:
         self.calc_zonstream(v, s)
 
         #  Use relaxation to solve for the anomaly streamfunction
-        relax1_nb(v.l1, v.l3, s.l1, s.l3, Grid.nx, Grid.ny, self.epsq, self.gamma)
-
+        #  and combine with the zonal mean
+        solve_s_nb(self.state, self.anom, self.zonal,
+                   self.epsq, self.gamma, self.omega)
 
-        # Should be a function
-        for j in range(Grid.ny+1):
-            s.l1t[:,j] = s.l1[:,j] + s.l1z[j]
-            s.l3t[:,j] = s.l3[:,j] + s.l3z[j]
         if self.time % self.diag_freq == 0:
-            self.diag(self.day, s)
+            diags = self.diag(self.day, s)
             if self.save_netcdf:
-                self.nc_output(self.day, v, s)
+                self.nc_output(self.day, v, s, diags)
 
-        # Time stepping
+        # Time stepping, the whole update of v and vm from xcalc to
+        # relax2 is done in advance_nb
         # self.xcalc(v, vm, s, self.dt, x)
-        alpha = self.a*self.dt/Grid.dx**2
-        b = self.beta*Grid.dx**2*Grid.dy
-        c = self.dt/(2.0*Grid.dx*Grid.dy)
-        h = 4*self.rgas*self.heat*self.gamma*self.dt/(self.f0*self.cp)
-        xcalc_nb(v.l1t, v.l3t, vm.l1t, vm.l3t, s.l1t, s.l3t, x.l1t, x.l3t,
-                    self.dt, Grid.nx, Grid.ny, self.epsq, alpha, b, c, h, self.k, self.gamma)
-
-        x.split()
-
-        # Solve for new zonal mean vorticity from x
-        self.calc_zvor(x,self.dt,v)
-
-        if self.time == 0.0:
-            # Forward step from rest. This simple form for the forward step
-            # assumes that it's starting from rest.
-            v.l1z = 0.5*x.l1z
-            v.l3z = 0.5*x.l3z
-        else:
-            # Update previous value of vorticity
-            vm.settot(v)
-
-        # Relaxation solver for non-zonal terms
+        # self.calc_zvor(x,self.dt,v)
         # self.relax2(x, self.dt, v)
-        alpha = self.a*self.dt/Grid.dx**2
-        relax2_nb(v.l1, v.l3, x.l1, x.l3, self.dt, Grid.nx, Grid.ny, alpha, self.epsq, self.k)
-
-        for j in range(Grid.ny+1):
-            v.l1t[:,j] = v.l1[:,j] + v.l1z[j]
-            v.l3t[:,j] = v.l3[:,j] + v.l3z[j]
+        forward = self.time == 0.0
+        phys = (self.a, self.beta, self.rgas, self.heat, self.f0, self.cp)
+        self.zvor_setup(self.dt)
+        if Grid.ny-1 <= thomas_max:
+            advance_nb(self.state, self.anom, self.zonal, *self.zvor_factors,
+                       self.dt, self.epsq, self.k, self.gamma, *phys, forward)
+        else:
+            # Zonal mean vorticity is solved with LAPACK by calc_zvor
+            advance_anom_nb(self.state, self.anom, self.zonal,
+                            self.dt, self.epsq, self.k, self.gamma, *phys,
+                            forward)
+            self.calc_zvor(x, self.dt, v)
+            if forward:
+                v.z[:] = 0.5*x.z
+            v.combine()
 
         self.time += self.dt
         self.day = self.time/86400.0
@@ -746,131 +881,320 @@ class Model:
             # print(f"Stability  {self.day:.2f} {stab_crit:.3f}")
             if stab_crit > 0.9:
                 print(f"At {self.day:.2f} {stab_crit:.3f} Adjusting time step to {self.dt-self.min_dt}")
-                vm.l1t[:] = v.l1t - (v.l1t-vm.l1t)*(self.dt-self.min_dt)/self.dt
-                vm.l3t[:] = v.l3t - (v.l3t-vm.l3t)*(self.dt-self.min_dt)/self.dt
+                vm.t[:] = v.t - (v.t-vm.t)*(self.dt-self.min_dt)/self.dt
                 self.dt -= self.min_dt
 
-@nb.jit(cache=True)
-def relax1_nb(v1, v3, s1, s3, nx, ny, epsq, gamma):
-    # Solve for anomaly streamfunction
-
-    # Start from the current value of the anomaly streamfunction
-    for iter in range(100):
-        # Jacobi iteration
-        maxdiff = 0.0
-        change = 0.0
-        # for irb in range(2):
+def make_calcvor(nx, ny):
+    @nb.njit(cache=True, fastmath=True)
+    def calcvor_nb(s, v, epsq, gamma):
+        # Vorticity from streamfunction, both levels in one pass.
+        # The ghost columns of s must be filled.
         for j in range(1,ny):
             jm = j-1
             jp = j+1
             for i in range(1,nx+1):
                 im = i-1
-                if im == 0:
-                    im = nx
                 ip = i+1
-                if ip == nx+1:
-                    ip = 1
-
-                resid = ( s1[ip,j] + s1[im,j] +
-                            epsq*( s1[i,jp] + s1[i,jm] ) -
-                            v1[i,j] + gamma*s3[i,j] ) -  \
-                            ( 2.0 + 2.0*epsq + gamma )*s1[i,j]
-                resid = resid / ( 2.0 + 2.0*epsq + gamma )
-                change = change + resid**2
-                maxdiff = max ( maxdiff, abs(resid) )
-                s1[i,j] = s1[i,j] + resid
-
-                resid = ( s3[ip,j] + s3[im,j] +
-                            epsq*( s3[i,jp] + s3[i,jm] ) -
-                            v3[i,j] + gamma*s1[i,j] ) -  \
-                            ( 2.0 + 2.0*epsq + gamma )*s3[i,j]
-
-                resid = resid / ( 2.0 + 2.0*epsq + gamma )
-                change = change + resid**2
-                maxdiff = max ( maxdiff, abs(resid) )
-                s3[i,j] = s3[i,j] + resid
-        # print("ITER1", iter, np.sqrt(change), maxdiff)
-        # maxdiff is now only on a single level so halve the convergence
-        # criterion
-        if maxdiff < 0.5*3.75e4:
-            # print("ITER1 done", iter, np.sqrt(change), maxdiff)
-            break
-    if iter >= 100:
-        raise Exception(f"RELAX1 failed {iter} {np.sqrt(change)} {maxdiff}")
-
-@nb.jit(cache=True)
-def relax2_nb(v1, v3, x1, x3, dt, nx, ny, alpha, epsq, k):
-    # Solve for anomaly vorticity
-
-    temp1 = np.zeros( (nx+1,ny+1) )
-    temp3 = np.zeros( (nx+1,ny+1) )
-
-    v1[:] = 0.0
-    v3[:] = 0.0
-    for iter in range(100):
-        # Jacobi iteration
-        for j in range(1,ny):
-            jm = j-1
-            jp = j+1
-            for i in range(1,nx+1):
-                im = i-1
-                if im == 0:
-                    im = nx
-                ip = i+1
-                if ip == nx+1:
-                    ip = 1
-                temp1[i,j] = ( alpha*( v1[ip,j] + v1[im,j] +
-                                            epsq * ( v1[i,jp] + v1[i,jm] ) ) +
-                                    x1[i,j]  ) /    \
-                                    ( 2*alpha*(1.0 + epsq)  + 1.0 )
-                temp3[i,j] = ( alpha*( v3[ip,j] + v3[im,j] +
-                                            epsq * ( v3[i,jp] + v3[i,jm] ) ) +
-                                    x3[i,j]  ) /    \
-                                    ( 2*alpha*(1.0 + epsq)  + 1.0 +1.5*k*dt )
-        change1 = np.sum ( ( v1[1:,1:] - temp1[1:,1:] ) **2 )
-        v1[:,1:ny] = temp1[:,1:ny]
-        # Boundary condition A17
-        v1[:,0] = v1[:,1].mean()
-        v1[:,ny] = v1[:,ny-1].mean()
-        change3 = np.sum ( ( v3[1:,1:] - temp3[1:,1:] ) **2 )
-        v3[:,1:ny] = temp3[:,1:ny]
-        v3[:,0] = v3[:,1].mean()
-        v3[:,ny] = v3[:,ny-1].mean()
-        if max(change1, change3) < 1.0:
-            # print("ITER2", iter, np.sqrt(change1), np.sqrt(change3))
-            break
-
-@nb.jit(cache=True)
-def xcalc_nb(v1t, v3t, vm1t, vm3t, s1t, s3t, x1t, x3t, dt, nx, ny, epsq, alpha, b, c, h, k, gamma):
-
-    x1t[:] = 0.0
-    x3t[:] = 0.0
-    for j in range(1,ny):
-        jm = j-1
-        jp = j+1
-        for i in range(1,nx+1):
-            im = i-1
-            if im == 0:
-                im = nx
-            ip = i+1
-            if ip == nx+1:
-                ip = 1
-
-            x1t[i,j] = vm1t[i,j] +                                           \
-                c * ( (v1t[ip,j]-v1t[im,j])*(s1t[i,jp]-s1t[i,jm]) -             \
-                        (2*b+v1t[i,jp]-v1t[i,jm])*(s1t[ip,j]-s1t[im,j]) ) +      \
-                        alpha * ( vm1t[ip,j]+vm1t[im,j]-2*vm1t[i,j] +           \
-                                epsq*(vm1t[i,jp]+vm1t[i,jm]-2*vm1t[i,j]) ) +        \
-                    h*(2*j-ny)/ny
-
-            x3t[i,j] = vm3t[i,j] +                                             \
-                c * ( (v3t[ip,j]-v3t[im,j])*(s3t[i,jp]-s3t[i,jm]) -              \
-                        (2*b+v3t[i,jp]-v3t[i,jm])*(s3t[ip,j]-s3t[im,j]) ) +       \
-                        alpha * ( vm3t[ip,j]+vm3t[im,j]-2*vm3t[i,j] +            \
-                                epsq*(vm3t[i,jp]+vm3t[i,jm]-2*vm3t[i,j]) ) -  \
-                    h*(2*j-ny)/ny
-            x3t[i,j] = x3t[i,j] -  k*dt*(1.5*vm3t[i,j] - v1t[i,j] -
-                                4*gamma*(s1t[i,j]-s3t[i,j]) )
+                coupling = gamma * ( s[0,j,i] - s[1,j,i] )
+                v[0,j,i] = ( s[0,j,ip]  + s[0,j,im] - 2*s[0,j,i] ) + \
+                    epsq * ( s[0,jp,i] + s[0,jm,i] - 2*s[0,j,i] ) - coupling
+                v[1,j,i] = ( s[1,j,ip] + s[1,j,im] - 2*s[1,j,i] ) + \
+                    epsq * ( s[1,jp,i] + s[1,jm,i] - 2*s[1,j,i] ) + coupling
+        # Follow A17 and set end rows to zonal mean of neighbours
+        _set_end_rows(v, nx, ny)
+    return calcvor_nb
+
+def make_relax1(nx, ny):
+    @nb.njit(cache=True, fastmath=True, boundscheck=False)
+    def relax1_nb(v, s, epsq, gamma, omega):
+        # Solve for anomaly streamfunction
+
+        diag = 2.0 + 2.0*epsq + gamma
+        inv = omega / diag
+        # Start from the current value of the anomaly streamfunction
+        for iter in range(100):
+            # Red-black Gauss-Seidel iteration with over-relaxation
+            maxdiff = 0.0
+            change = 0.0
+            for color in range(2):
+                # Ghost columns from the points of the other colour
+                # updated in the previous sweep
+                _pad_periodic(s, nx)
+                for j in range(1,ny):
+                    jm = j-1
+                    jp = j+1
+                    # First point of this colour, (i+j)%2 == color
+                    for i in range(1+(j+1+color)%2,nx+1,2):
+                        im = i-1
+                        ip = i+1
+
+                        resid = ( s[0,j,ip] + s[0,j,im] +
+                                    epsq*( s[0,jp,i] + s[0,jm,i] ) -
+                                    v[0,j,i] + gamma*s[1,j,i] ) -  \
+                                    diag*s[0,j,i]
+                        resid = inv*resid
+                        change = change + resid**2
+                        maxdiff = max ( maxdiff, abs(resid) )
+                        s[0,j,i] = s[0,j,i] + resid
+
+                        resid = ( s[1,j,ip] + s[1,j,im] +
+                                    epsq*( s[1,jp,i] + s[1,jm,i] ) -
+                                    v[1,j,i] + gamma*s[0,j,i] ) -  \
+                                    diag*s[1,j,i]
+
+                        resid = inv*resid
+                        change = change + resid**2
+                        maxdiff = max ( maxdiff, abs(resid) )
+                        s[1,j,i] = s[1,j,i] + resid
+            # print("ITER1", iter, np.sqrt(change), maxdiff)
+            # maxdiff is now only on a single level so halve the convergence
+            # criterion
+            if maxdiff < 0.5*3.75e4:
+                # print("ITER1 done", iter, np.sqrt(change), maxdiff)
+                break
+        if iter >= 100:
+            raise Exception(f"RELAX1 failed {iter} {np.sqrt(change)} {maxdiff}")
+        _pad_periodic(s, nx)
+    return relax1_nb
+
+def make_relax2(nx, ny):
+    @nb.njit(cache=True, fastmath=True, boundscheck=False)
+    def relax2_nb(v, x, dt, alpha, epsq, k):
+        # Solve for anomaly vorticity
+
+        v[:] = 0.0
+        inv1 = 1.0 / ( 2*alpha*(1.0 + epsq)  + 1.0 )
+        inv3 = 1.0 / ( 2*alpha*(1.0 + epsq)  + 1.0 +1.5*k*dt )
+        for iter in range(100):
+            # Red-black Gauss-Seidel iteration, updating in place
+            change1 = 0.0
+            change3 = 0.0
+            for color in range(2):
+                # Ghost columns from the points of the other colour
+                # updated in the previous sweep
+                _pad_periodic(v, nx)
+                for j in range(1,ny):
+                    jm = j-1
+                    jp = j+1
+                    # First point of this colour, (i+j)%2 == color
+                    for i in range(1+(j+1+color)%2,nx+1,2):
+                        im = i-1
+                        ip = i+1
+                        new = ( alpha*( v[0,j,ip] + v[0,j,im] +
+                                        epsq * ( v[0,jp,i] + v[0,jm,i] ) ) +
+                                x[0,j,i]  ) * inv1
+                        change1 = change1 + ( new - v[0,j,i] )**2
+                        v[0,j,i] = new
+                        new = ( alpha*( v[1,j,ip] + v[1,j,im] +
+                                        epsq * ( v[1,jp,i] + v[1,jm,i] ) ) +
+                                x[1,j,i]  ) * inv3
+                        change3 = change3 + ( new - v[1,j,i] )**2
+                        v[1,j,i] = new
+            # Boundary condition A17
+            _set_end_rows(v, nx, ny)
+            if max(change1, change3) < 1.0:
+                # print("ITER2", iter, np.sqrt(change1), np.sqrt(change3))
+                break
+        _pad_periodic(v, nx)
+    return relax2_nb
+
+def make_xcalc(nx, ny, bj):
+    # Rows are independent, so blocks of bj rows are shared between
+    # threads and the j-1, j, j+1 rows of a block stay in cache
+    nblock = (ny-1 + bj-1) // bj
+    # Explicit signature so it is compiled when the module is loaded
+    # rather than on the first step
+    @nb.njit('void(f8[:,:,::1],f8[:,:,::1],f8[:,:,::1],f8[:,:,::1],'
+             'f8,f8,f8,f8,f8,f8,f8,f8)',
+             cache=True, fastmath=True, boundscheck=False,
+             error_model='numpy', parallel=True)
+    def xcalc_nb(v, vm, s, x, dt, epsq, alpha, b, c, h, k, gamma):
+        # Loop invariants
+        two_b = 2.0*b
+        inv_ny = 1.0/ny
+        kdt = k*dt
+        four_gamma = 4*gamma
+
+        # Periodic neighbours in x come from the ghost columns
+        _pad_periodic(v, nx)
+        _pad_periodic(vm, nx)
+        _pad_periodic(s, nx)
+
+        # All the interior points are set below, only the end rows
+        # need clearing
+        x[:,0,:] = 0.0
+        x[:,ny,:] = 0.0
+        for jb in nb.prange(nblock):
+            j0 = 1 + jb*bj
+            for j in range(j0, min(j0+bj, ny)):
+                jm = j-1
+                jp = j+1
+                # Heating only depends on j
+                forcing_j = h*(2*j-ny)*inv_ny
+                for i in range(1,nx+1):
+                    im = i-1
+                    ip = i+1
+                    # Differences and diffusion terms for each level
+                    v1dx = v[0,j,ip] - v[0,j,im]
+                    v1dy = v[0,jp,i] - v[0,jm,i]
+                    s1dx = s[0,j,ip] - s[0,j,im]
+                    s1dy = s[0,jp,i] - s[0,jm,i]
+                    lapx1 = vm[0,j,ip] + vm[0,j,im] - 2*vm[0,j,i]
+                    lapy1 = vm[0,jp,i] + vm[0,jm,i] - 2*vm[0,j,i]
+                    v3dx = v[1,j,ip] - v[1,j,im]
+                    v3dy = v[1,jp,i] - v[1,jm,i]
+                    s3dx = s[1,j,ip] - s[1,j,im]
+                    s3dy = s[1,jp,i] - s[1,jm,i]
+                    lapx3 = vm[1,j,ip] + vm[1,j,im] - 2*vm[1,j,i]
+                    lapy3 = vm[1,jp,i] + vm[1,jm,i] - 2*vm[1,j,i]
+
+                    x[0,j,i] = vm[0,j,i] + \
+                        c * ( v1dx*s1dy - (two_b+v1dy)*s1dx ) + \
+                        alpha * ( lapx1 + epsq*lapy1 ) + forcing_j
+                    x[1,j,i] = vm[1,j,i] + \
+                        c * ( v3dx*s3dy - (two_b+v3dy)*s3dx ) + \
+                        alpha * ( lapx3 + epsq*lapy3 ) - forcing_j - \
+                        kdt*(1.5*vm[1,j,i] - v[0,j,i] -
+                             four_gamma*(s[0,j,i]-s[1,j,i]) )
+    return xcalc_nb
+
+def make_split(nx, ny):
+    @nb.njit(cache=True)
+    def split_nb(t, a, z):
+        # As Var.split
+        for l in range(2):
+            for j in range(ny+1):
+                zm = 0.0
+                for i in range(1,nx+1):
+                    zm += t[l,j,i]
+                zm = zm / nx
+                z[l,j] = zm
+                for i in range(nx+2):
+                    a[l,j,i] = t[l,j,i] - zm
+    return split_nb
+
+def make_combine(nx, ny):
+    @nb.njit(cache=True)
+    def combine_nb(a, z, t):
+        # As Var.combine
+        for l in range(2):
+            for j in range(ny+1):
+                for i in range(nx+2):
+                    t[l,j,i] = a[l,j,i] + z[l,j]
+    return combine_nb
+
+# Drivers for Model.step working on the Model state blocks, where
+# index 0 is v, 1 is vm, 2 is s and 3 is x. They cover everything
+# except the banded LAPACK solve in calc_zonstream and the diagnostics,
+# and the zonal mean vorticity when it is too big for _thomas.
+
+def make_solve_s(nx, ny):
+    @nb.njit(cache=True)
+    def solve_s_nb(state, anom, zonal, epsq, gamma, omega):
+        relax1_nb(anom[0], anom[2], epsq, gamma, omega)
+        combine_nb(anom[2], zonal[2], state[2])
+    return solve_s_nb
+
+def make_xcalc_coeffs(dx, dy):
+    @nb.njit(cache=True)
+    def xcalc_coeffs_nb(dt, a, beta, rgas, heat, gamma, f0, cp):
+        # Coefficients alpha, b, c and h for xcalc_nb
+        alpha = a*dt/dx**2
+        b = beta*dx**2*dy
+        c = dt/(2.0*dx*dy)
+        h = 4*rgas*heat*gamma*dt/(f0*cp)
+        return alpha, b, c, h
+    return xcalc_coeffs_nb
+
+def make_advance_anom(nx, ny):
+    @nb.njit(cache=True)
+    def advance_anom_nb(state, anom, zonal, dt, epsq, k, gamma,
+                        a, beta, rgas, heat, f0, cp, forward):
+        # Time step of the vorticity except for the zonal mean, which
+        # is left to advance_nb or calc_zvor
+        alpha, b, c, h = xcalc_coeffs_nb(dt, a, beta, rgas, heat, gamma,
+                                         f0, cp)
+        xcalc_nb(state[0], state[1], state[2], state[3], dt,
+                 epsq, alpha, b, c, h, k, gamma)
+        split_nb(state[3], anom[3], zonal[3])
+
+        if not forward:
+            # Update previous value of vorticity
+            state[1] = state[0]
+
+        # Relaxation solver for non-zonal terms
+        relax2_nb(anom[0], anom[3], dt, alpha, epsq, k)
+    return advance_anom_nb
+
+def make_advance(nx, ny):
+    @nb.njit(cache=True)
+    def advance_nb(state, anom, zonal, za, zcp, zrpiv, dt, epsq, k, gamma,
+                   a, beta, rgas, heat, f0, cp, forward):
+        advance_anom_nb(state, anom, zonal, dt, epsq, k, gamma,
+                        a, beta, rgas, heat, f0, cp, forward)
+
+        # Zonal mean vorticity as calc_zvor, for systems small enough
+        # for _thomas
+        _thomas(za, zcp, zrpiv, zonal[3,:,1:ny], zonal[0,:,1:ny])
+        zonal[0,:,0] = zonal[0,:,1]
+        zonal[0,:,ny] = zonal[0,:,ny-1]
+
+        if forward:
+            # Forward step from rest. This simple form for the forward step
+            # assumes that it's starting from rest.
+            zonal[0] = 0.5*zonal[3]
+
+        combine_nb(anom[0], zonal[0], state[0])
+    return advance_nb
+
+def xcalc_np(v, vm, s, x, dt, epsq, alpha, b, c, h, k, gamma):
+    # NumPy version of xcalc_nb, both levels at once as slices of the
+    # halo padded arrays
+    nx = Grid.nx
+    ny = Grid.ny
+    _pad_periodic(v, nx)
+    _pad_periodic(vm, nx)
+    _pad_periodic(s, nx)
+    jc = slice(1,ny)
+    ic = slice(1,nx+1)
+    C = (slice(None), jc, ic)
+    N = (slice(None), slice(2,ny+1), ic)    # j+1
+    S = (slice(None), slice(0,ny-1), ic)    # j-1
+    E = (slice(None), jc, slice(2,nx+2))    # i+1
+    W = (slice(None), jc, slice(0,nx))      # i-1
+
+    forcing = (h*(2*np.arange(1,ny)-ny)/ny)[:,np.newaxis]
+    x[:,0,:] = 0.0
+    x[:,ny,:] = 0.0
+    xc = x[C]
+    xc[:] = vm[C] + \
+        c * ( (v[E]-v[W])*(s[N]-s[S]) - (2.0*b+v[N]-v[S])*(s[E]-s[W]) ) + \
+        alpha * ( vm[E]+vm[W]-2*vm[C] + epsq*(vm[N]+vm[S]-2*vm[C]) )
+    xc[0] += forcing
+    xc[1] -= forcing
+    xc[1] -= k*dt*(1.5*vm[1,jc,ic] - v[0,jc,ic] -
+                   4*gamma*(s[0,jc,ic]-s[1,jc,ic]))
+
+# Rows per block in xcalc_nb. Each row of the block reads 6 rows
+# of nx+2 values, so for large grids keep bj*6*8*(nx+2) bytes
+# within L1
+xcalc_bj = 4
+
+# The grid size is fixed, so build the kernels with nx and ny as
+# compile time constants rather than passing them in
+calcvor_nb = make_calcvor(Grid.nx, Grid.ny)
+relax1_nb = make_relax1(Grid.nx, Grid.ny)
+relax2_nb = make_relax2(Grid.nx, Grid.ny)
+if have_numba:
+    xcalc_nb = make_xcalc(Grid.nx, Grid.ny, xcalc_bj)
+else:
+    xcalc_nb = xcalc_np
+split_nb = make_split(Grid.nx, Grid.ny)
+combine_nb = make_combine(Grid.nx, Grid.ny)
+solve_s_nb = make_solve_s(Grid.nx, Grid.ny)
+xcalc_coeffs_nb = make_xcalc_coeffs(Grid.dx, Grid.dy)
+advance_anom_nb = make_advance_anom(Grid.nx, Grid.ny)
+advance_nb = make_advance(Grid.nx, Grid.ny)
 
 class Animation():
     def __init__(self, m, t1):
@@ -878,18 +1202,38 @@ class Animation():
         self.t1 = t1
         fig = plt.figure(figsize=(12,8))
         self.axes1 = fig.add_subplot(1,3,1)
-        self.p = plt.contourf(self.m.calc_ps().T[::-1,1:]+self.m.ps_offset, levels=self.m.ps_levels, cmap=self.m.ps_cmap, extend='both')
-        self.pc = plt.contour(self.m.calc_ps().T[::-1,1:]+self.m.ps_offset, levels=self.m.ps_levels, colors='black', negative_linestyles='solid')
-        plt.colorbar(self.p, orientation='horizontal', label='Sea level pressure (hPa)')
+        # Contiguous buffer for the displayed pressure, filled each frame
+        # and shared by the filled contours and the contour lines
+        self.ps = np.empty( (Grid.ny+1,Grid.nx) )
+        # ps_offset is taken off the contour levels once here rather than
+        # added to the field every frame, and added back in the colorbar
+        # labels
+        self.ps_levels = self.m.ps_levels - self.m.ps_offset
+        ps = self.display_ps()
+        self.p = plt.contourf(ps, levels=self.ps_levels, cmap=self.m.ps_cmap, extend='both')
+        self.pc = plt.contour(ps, levels=self.ps_levels, colors='black', negative_linestyles='solid')
+        cb = plt.colorbar(self.p, orientation='horizontal', label='Sea level pressure (hPa)')
+        cb.set_ticks(self.ps_levels[::2])
+        cb.formatter = ticker.FuncFormatter(lambda p, pos: f"{p+self.m.ps_offset:g}")
+        cb.update_ticks()
+        # T and U are drawn with pcolormesh so each frame only has to
+        # reset the data. BoundaryNorm gives the same colour bands as
+        # contourf with these levels.
         self.axes2 = fig.add_subplot(1,3,2)
-        self.pT = plt.contourf(self.m.calc_T().T[::-1,1:], levels=self.m.T_levels, cmap=self.m.T_cmap, extend='both')
+        self.pT = plt.pcolormesh(self.m.calc_T()[::-1,1:Grid.nx+1], shading='nearest', cmap=self.m.T_cmap,
+                                 norm=colors.BoundaryNorm(self.m.T_levels, plt.get_cmap(self.m.T_cmap).N, extend='both'))
         plt.colorbar(self.pT, orientation='horizontal', label='Temperature at 500 hPa ($\degree$C)')
         self.axes3 = fig.add_subplot(1,3,3)
-        u = self.m.calc_u(self.m.s)
-        usurf = 1.5*u.l3t - 0.5*u.l1t
-        self.pU = plt.contourf(usurf.T[::-1,1:], levels=self.m.u_levels, cmap=self.m.u_cmap, extend='both')
-        # self.pU = plt.contourf(self.m.calc_u(self.m.s).l1t.T[::-1,1:], levels=self.m.u_levels, cmap=self.m.u_cmap, extend='both')
+        self.usurf = self.m.calc_usurf(self.m.s)
+        self.pU = plt.pcolormesh(self.usurf[::-1,1:Grid.nx+1], shading='nearest', cmap=self.m.u_cmap,
+                                 norm=colors.BoundaryNorm(self.m.u_levels, plt.get_cmap(self.m.u_cmap).N, extend='both'))
+        # self.pU = plt.contourf(self.m.calc_u(self.m.s).l1t[::-1,1:Grid.nx+1], levels=self.m.u_levels, cmap=self.m.u_cmap, extend='both')
         plt.colorbar(self.pU, orientation='horizontal', label='Zonal wind at 1000 hPa (m/s)')
+        # The pcolormesh cells reach half a point past the grid, so clip
+        # to the pressure panel limits to keep the panels lined up
+        for ax in (self.axes2, self.axes3):
+            ax.set_xlim(self.axes1.get_xlim())
+            ax.set_ylim(self.axes1.get_ylim())
         self.animation = animation.FuncAnimation(fig, self.update, frames=10000,
                                 interval=0, repeat=False)
         self.axes2.set_title(f"Day {self.m.day-self.m.day1:.2f}\n", fontsize=20)
@@ -899,9 +1243,16 @@ class Animation():
         fig.canvas.mpl_connect('button_press_event', self.toggle_pause)
         self.paused = False
         self.dosleep = False
+        # The model steps every frame, but the fields are only redrawn
+        # every render_every frames
+        self.render_every = 5
         # self.paused=True
         # self.animation.pause()
 
+    def display_ps(self):
+        np.copyto(self.ps, self.m.calc_ps()[::-1,1:Grid.nx+1])
+        return self.ps
+
     def toggle_pause(self, event):
         # If paused, use right button to single step
         if event.button == 1:
@@ -922,26 +1273,33 @@ class Animation():
 
         # This gives a chance to pause on the first frame
         if i > 3:
-            self.m.step()
+            try:
+                self.m.step()
+            except ModelBreakdown as e:
+                self.animation.event_source.stop()
+                t2 = time.perf_counter()
+                print(f"Stopping, {e}")
+                print("Elapsed time", t2-self.t1)
+                return
+
+        self.axes2.set_title(f"Day {self.m.day-self.m.day1:.2f}\n", fontsize=20)
+        if i % self.render_every != 0:
+            return
 
-        # tmp = self.m.calc_ps().T[::-1,1:]
+        # tmp = self.m.calc_ps()[::-1,1:Grid.nx+1]
         # print(tmp.max(), tmp.min())
         # For animating a contour plot
         # https://scipython.com/blog/animated-contour-plots-with-matplotlib/
+        ps = self.display_ps()
         self.p.remove()
-        self.p = self.axes1.contourf(self.m.calc_ps().T[::-1,1:]+self.m.ps_offset, levels=self.m.ps_levels, cmap=self.m.ps_cmap, extend='both')
+        self.p = self.axes1.contourf(ps, levels=self.ps_levels, cmap=self.m.ps_cmap, extend='both')
         self.pc.remove()
-        self.pc = self.axes1.contour(self.m.calc_ps().T[::-1,1:]+self.m.ps_offset, levels=self.m.ps_levels, colors='black', negative_linestyles='solid')
-        self.axes2.set_title(f"Day {self.m.day-self.m.day1:.2f}\n", fontsize=20)
+        self.pc = self.axes1.contour(ps, levels=self.ps_levels, colors='black', negative_linestyles='solid')
         # For a pcolormesh simply reset the data
-        # self.pT.set_array(self.m.calc_T().T[::-1,1:].flatten())
-        self.pT.remove()
-        self.pT = self.axes2.contourf(self.m.calc_T().T[::-1,1:], levels=self.m.T_levels, cmap=self.m.T_cmap, extend='both')
-        self.pU.remove()
-        u = self.m.calc_u(self.m.s)
-        usurf = 1.5*u.l3t - 0.5*u.l1t
-        self.pU = self.axes3.contourf(usurf.T[::-1,1:], levels=self.m.u_levels, cmap=self.m.u_cmap, extend='both')
-        # self.pU = self.axes3.contourf(self.m.calc_u(self.m.s).l1t.T[::-1,1:], levels=self.m.u_levels, cmap=self.m.u_cmap, extend='both')
+        self.pT.set_array(self.m.calc_T()[::-1,1:Grid.nx+1])
+        self.m.calc_usurf(self.m.s, self.usurf)
+        self.pU.set_array(self.usurf[::-1,1:Grid.nx+1])
+        # self.pU.set_array(self.m.calc_u(self.m.s).l1t[::-1,1:Grid.nx+1])
         plt.tight_layout()
 
 def main():
@@ -961,7 +1319,11 @@ def main():
     else:
         t1x = 0
         while m.day < m.day2:
-            m.step()
+            try:
+                m.step()
+            except ModelBreakdown as e:
+                print(f"Stopping, {e}")
+                break
             if not t1x:
                 t1x = time.perf_counter()
         t2 = time.perf_counter()